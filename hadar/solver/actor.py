@@ -1,6 +1,8 @@
-import time
+import os
+import threading
+from collections import deque
 
-from pykka import ThreadingActor, ActorRegistry
+from pykka import ThreadingActor, ActorRegistry, ActorDeadError
 
 from hadar.solver.broker import Broker
 from hadar.solver.domain import *
@@ -18,25 +20,34 @@ def singleton(class_):
 @singleton
 class Waiter:
     def __init__(self, wait_ms=0):
-        self.updated = True
         self.wait_ms = wait_ms
+        self.updated = threading.Event()
+        self.updated.set()
 
     def wait(self):
-        while self.updated:
-            self.updated = False
-            time.sleep(self.wait_ms / 1000)
+        """
+        Block until no update happens during wait_ms.
+
+        :return:
+        """
+        while self.updated.is_set():
+            self.updated.clear()
+            if not self.updated.wait(timeout=self.wait_ms / 1000):
+                return
 
     def update(self):
-        self.updated = True
+        self.updated.set()
 
 
 class Dispatcher(ThreadingActor):
 
     def __init__(self, name,
                  min_exchange: int=1,
-                 consumptions: List[Consumption] = [],
-                 productions: List[Production] = [],
-                 borders: List[Border] = []):
+                 consumptions: List[Consumption] = None,
+                 productions: List[Production] = None,
+                 borders: List[Border] = None,
+                 trace: bool=None,
+                 trace_size: int=10000):
         super().__init__()
 
         self.name = name
@@ -49,7 +60,10 @@ class Dispatcher(ThreadingActor):
                              borders=borders)
 
         self.waiter = Waiter()
-        self.events = []
+        self.refs = {}
+        # Record events only for debugging, enable by HADAR_TRACE environment variable
+        self.trace = Dispatcher.trace_from_env() if trace is None else trace
+        self.events = deque(maxlen=trace_size) if self.trace else None
 
         self.actor_ref.actor_urn = name
         ActorRegistry.register(self.actor_ref)
@@ -62,7 +76,8 @@ class Dispatcher(ThreadingActor):
         :return:
         """
         self.waiter.update()
-        self.events.append(Event(type='recv', message=message))
+        if self.trace:
+            self.events.append(Event(type='recv', message=message))
 
         if isinstance(message, Start):
             self.broker.init()
@@ -72,7 +87,8 @@ class Dispatcher(ThreadingActor):
             return self.name, self.next()
         elif isinstance(message, ProposalOffer):
             ex = self.broker.receive_proposal_offer(proposal=message)
-            self.events.append(Event(type='recv res', message=ex))
+            if self.trace:
+                self.events.append(Event(type='recv res', message=ex))
             return ex
         elif isinstance(message, Proposal):
             self.broker.receive_proposal(proposal=message)
@@ -83,15 +99,43 @@ class Dispatcher(ThreadingActor):
         ActorRegistry.unregister(self.actor_ref)
 
     def tell_to(self, to: str, mes):
-        self.events.append(Event(type='tell', message=mes))
-        ActorRegistry.get_by_urn(to).tell(mes)
+        if self.trace:
+            self.events.append(Event(type='tell', message=mes))
+        try:
+            self.get_ref(to).tell(mes)
+        except ActorDeadError:
+            self.refs.pop(to, None)
+            raise
 
     def ask_to(self, to: str, mes):
-        self.events.append(Event(type='ask', message=mes))
-        res = ActorRegistry.get_by_urn(to).ask(mes)
-        self.events.append(Event(type='ask res', message=res))
+        if self.trace:
+            self.events.append(Event(type='ask', message=mes))
+        try:
+            res = self.get_ref(to).ask(mes)
+        except ActorDeadError:
+            self.refs.pop(to, None)
+            raise
+        if self.trace:
+            self.events.append(Event(type='ask res', message=res))
         return res
 
+    def get_ref(self, to: str):
+        """
+        Get actor reference from name. Reference is cached after first registry lookup.
+
+        :param to: actor name
+        :return: actor reference
+        """
+        ref = self.refs.get(to)
+        if ref is None:
+            ref = ActorRegistry.get_by_urn(to)
+            self.refs[to] = ref
+        return ref
+
+    @staticmethod
+    def trace_from_env() -> bool:
+        return os.environ.get('HADAR_TRACE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
     def next(self):
         c, p, b = self.broker.compute_total()
         # plot(self)
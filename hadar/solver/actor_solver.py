@@ -2,6 +2,7 @@ from pykka import ActorRegistry
 
 from hadar.solver.domain import *
 from hadar.solver.actor import Dispatcher, Waiter
+from hadar.solver.broker import Broker
 
 
 def create_dispatcher(name: str, node: NodeQuantity) -> Dispatcher:
@@ -12,19 +13,46 @@ def create_dispatcher(name: str, node: NodeQuantity) -> Dispatcher:
                             borders=node.borders)
 
 
+def solve_isolated(name: str, node: NodeQuantity) -> NodeQuantity:
+    """
+    Solve node without any exchange in one shot, without actor.
+
+    :param name: node name
+    :param node: node to solve
+    :return: node with quantity used
+    """
+    broker = Broker(name=name,
+                    tell=None,
+                    ask=None,
+                    min_exchange=1,
+                    consumptions=node.consumptions,
+                    productions=node.productions,
+                    borders=node.borders)
+    cons, prod, borders = broker.compute_total()
+    return NodeQuantity(consumptions=cons, productions=prod, borders=borders)
+
+
 def solve(study: Study) -> Study:
     waiter = Waiter(wait_ms=2)
 
-    dispatcher = [create_dispatcher(name, node) for name, node in study.nodes.items()]
-    for d in dispatcher:
-        d.tell(Start())
+    # Node without border and not reached by any border doesn't need to exchange
+    connected = {b.dest for node in study.nodes.values() for b in node.borders}
+    connected.update(name for name, node in study.nodes.items() if node.borders)
+
+    nodes = {name: solve_isolated(name, node) for name, node in study.nodes.items() if name not in connected}
+
+    dispatcher = [create_dispatcher(name, node) for name, node in study.nodes.items() if name in connected]
+    if dispatcher:
+        for d in dispatcher:
+            d.tell(Start())
 
-    waiter.wait()
+        waiter.wait()
 
-    nodes = {}
-    for d in dispatcher:
-        name, (cons, prod, borders) = d.ask(Next())
-        nodes[name] = NodeQuantity(consumptions=cons, productions=prod, borders=borders)
+        # Ask all dispatchers before waiting any result
+        futures = [d.ask(Next(), block=False) for d in dispatcher]
+        for f in futures:
+            name, (cons, prod, borders) = f.get()
+            nodes[name] = NodeQuantity(consumptions=cons, productions=prod, borders=borders)
 
-    ActorRegistry.stop_all()
+        ActorRegistry.stop_all()
     return Study(nodes=nodes)
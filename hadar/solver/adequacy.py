@@ -1,4 +1,5 @@
-from copy import deepcopy, copy
+from copy import copy
+from operator import attrgetter
 
 from hadar.solver.domain import *
 
@@ -22,24 +23,21 @@ def is_same_prod(a: Production, b: Production):
     return a.exchange.id == b.exchange.id
 
 
-def clean_production(productions: List[Production]) -> List[Production]:
+def clean_production(productions: Iterable[Production]) -> List[Production]:
     """
     Make a copy of production. Sort them. Regroupe quantity if same production.
 
     :param productions: production to clean before optimize
     :return: productions copied, sorted and grouped
     """
-    productions = deepcopy(productions)
-    productions.sort(key=lambda x: x.cost)
-
-    # Merge same production (same id and exchange id)
-    i = 0
-    while i < len(productions):
-        while i+1 < len(productions) and is_same_prod(productions[i], productions[i+1]):
-            productions[i].quantity += productions[i+1].quantity
-            del productions[i+1]
-        i += 1
-    return productions
+    cleaned = []
+    for prod in sorted(productions, key=attrgetter('cost')):
+        # Merge same production (same id and exchange id)
+        if cleaned and is_same_prod(cleaned[-1], prod):
+            cleaned[-1].quantity += prod.quantity
+        else:
+            cleaned.append(copy(prod))
+    return cleaned
 
 
 def copy_production(production: Production, quantity: int) -> Production:
@@ -54,7 +52,7 @@ def copy_production(production: Production, quantity: int) -> Production:
     return p
 
 
-def optimize_adequacy(consumptions: List[Consumption], productions: List[Production]) -> NodeState:
+def optimize_adequacy(consumptions: List[Consumption], productions: Iterable[Production]) -> NodeState:
     """
     Compute adequacy by optimizing mix cost
 
@@ -70,17 +68,21 @@ def optimize_adequacy(consumptions: List[Consumption], productions: List[Product
     rac = - sum([c.quantity for c in consumptions])
     cost = 0
 
-    # Compute prod cost
+    # Compute prod cost. Productions are already copied, only split production needs new copies
     for prod in productions:
-        used = min(prod.quantity, max(0, -rac))
-        if used:
+        quantity = prod.quantity
+        used = min(quantity, max(0, -rac))
+        rac += quantity
+        if used == quantity:
+            if used:
+                productions_used.append(prod)
+                cost += prod.cost*used
+        elif used:
             productions_used.append(copy_production(prod, used))
-        rac += prod.quantity
-        cost += prod.cost*used
-
-        free = prod.quantity - used
-        if free:
-            productions_free.append(copy_production(prod, free))
+            productions_free.append(copy_production(prod, quantity - used))
+            cost += prod.cost*used
+        else:
+            productions_free.append(prod)
 
     # Compute load cost
     i = 0
@@ -92,3 +94,4 @@ def optimize_adequacy(consumptions: List[Consumption], productions: List[Product
         gap = cons.quantity
 
     return NodeState(productions_used, productions_free, cost, rac)
+
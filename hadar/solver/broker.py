@@ -1,6 +1,9 @@
+import os
 import uuid
 from copy import copy, deepcopy
-from typing import List
+from itertools import chain
+from operator import attrgetter
+from typing import List, Tuple
 
 from hadar.solver.domain import *
 
@@ -11,6 +14,9 @@ class LedgerExchange:
 
     def __init__(self):
         self.ledger = {}
+        self.borders_by_exchange = {}
+        self.production_totals = {}
+        self.border_totals = {}
 
     def add_all(self, ex: List[Exchange]):
         for e in ex:
@@ -26,32 +32,27 @@ class LedgerExchange:
         if ex.id in self.ledger[border][ex.production_id].keys():
             raise ValueError('Exchange already stored in ledger')
         self.ledger[border][ex.production_id][ex.id] = ex
+        self.borders_by_exchange[ex.id] = border
+        self.production_totals[ex.production_id] = self.production_totals.get(ex.production_id, 0) + ex.quantity
+        self.border_totals[border] = self.border_totals.get(border, 0) + ex.quantity
 
     def delete(self, ex: Exchange):
-        for border, productions in self.ledger.items():
-            if ex.production_id in productions.keys():
-                for _,  exchanges in productions.items():
-                    if ex.id in exchanges.keys():
-                        del self.ledger[border][ex.production_id][ex.id]
+        border = self.borders_by_exchange.pop(ex.id, None)
+        if border is None:
+            return
+        stored = self.ledger[border][ex.production_id].pop(ex.id)
+        self.production_totals[stored.production_id] -= stored.quantity
+        self.border_totals[border] -= stored.quantity
 
     def delete_all(self, exs: List[Exchange]):
         for ex in exs:
             self.delete(ex)
 
     def sum_production(self, production_id):
-        acc = 0
-        for border, prods in self.ledger.items():
-            if production_id in prods.keys():
-                acc += sum([ex.quantity for ex in prods[production_id].values()])
-        return acc
+        return self.production_totals.get(production_id, 0)
 
     def sum_border(self, name: str):
-        if name not in self.ledger.keys():
-            return 0
-        acc = 0
-        for prod in self.ledger[name].values():
-            acc += sum([ex.quantity for ex in prod.values()])
-        return acc
+        return self.border_totals.get(name, 0)
 
 
 class Broker:
@@ -62,17 +63,21 @@ class Broker:
                  uuid_generate=uuid.uuid4,
                  ledger_exchange: LedgerExchange = None,
                  min_exchange: int=1,
-                 consumptions: List[Consumption] = [],
-                 productions: List[Production] = [],
-                 borders: List[Border] = []):
+                 consumptions: List[Consumption] = None,
+                 productions: List[Production] = None,
+                 borders: List[Border] = None):
         super().__init__()
+        consumptions = [] if consumptions is None else consumptions
+        productions = [] if productions is None else productions
+        borders = [] if borders is None else borders
 
         self.name = name
         self.tell = tell
         self.ask = ask
         self.uuid_generate = uuid_generate
-        self.consumptions = sorted(consumptions, key=lambda x: x.cost, reverse=True)
+        self.consumptions = sorted(consumptions, key=attrgetter('cost'), reverse=True)
         self.raw_productions = Broker.generate_production_id(productions, self.uuid_generate)
+        self.raw_productions_by_id = {p.id: p for p in self.raw_productions}
         self.borders = borders
         self.ledger_exchanges = LedgerExchange() if ledger_exchange is None else ledger_exchange
         self.min_exchange = min_exchange
@@ -86,7 +91,7 @@ class Broker:
         """
         self.send_proposal(productions=self.state.productions_free)
 
-    def send_proposal(self, productions: List[Production], path_node: List[str] = []):
+    def send_proposal(self, productions: List[Production], path_node: Tuple[str, ...] = ()):
         """
         Send production proposal to all border.
 
@@ -94,16 +99,18 @@ class Broker:
         :param path_node: history node already receive this proposal
         :return:
         """
+        path_node = (self.name,) + path_node
+        path_set = frozenset(path_node)
 
         for b in self.borders:
-            proposals = [Proposal(production_id=prod.id,
-                                  cost=prod.cost + b.cost,
-                                  quantity=prod.quantity,
-                                  path_node=[self.name] + path_node)
-                         for prod in productions]
-            for prop in proposals:
-                if b not in prop.path_node:
-                    self.tell(to=b.dest, mes=prop)
+            # Don't send back proposal to node already crossed
+            if b.dest in path_set:
+                continue
+            for prod in productions:
+                self.tell(to=b.dest, mes=Proposal(production_id=prod.id,
+                                                  cost=prod.cost + b.cost,
+                                                  quantity=prod.quantity,
+                                                  path_node=path_node))
 
     def receive_proposal(self, proposal: Proposal):
         """
@@ -114,7 +121,14 @@ class Broker:
         """
         # TODO test
         prod = Production(cost=proposal.cost, quantity=proposal.quantity, type='import', id=proposal.production_id)
-        new_state = optimize_adequacy(self.consumptions, [prod] + self.state.productions_used + self.state.productions_free)
+
+        # Consumption already satisfied with cheaper productions, proposal can't improve cost
+        if self.state.rac >= 0 and proposal.cost >= self.state.worst_used_cost:
+            self.send_proposal(productions=[prod], path_node=proposal.path_node)
+            return
+
+        new_state = optimize_adequacy(self.consumptions,
+                                      chain([prod], self.state.productions_used, self.state.productions_free))
         if new_state.cost < self.state.cost:
             self.make_offer(proposal, new_state)
         else:
@@ -136,18 +150,19 @@ class Broker:
 
         # Forward proposal if path has next dispatcher
         if len(proposal.path_node) > 1:
-            forward = deepcopy(proposal)
+            forward = copy(proposal)
             forward.path_node = proposal.path_node[1:]
             ex = self.ask(to=forward.path_node[0], mes=forward)
 
             # Save exchange to ledger
-            for e in deepcopy(ex):
+            for e in ex:
+                e = copy(e)
                 e.path_node = self.trim_path(e.path_node)
                 self.ledger_exchanges.add(e)
             return ex
 
         # Check production remain capacity
-        quantity_free = Broker.find_production(self.state.productions_free, proposal.production_id).quantity
+        quantity_free = self.state.find_free(proposal.production_id).quantity
         quantity_used = self.ledger_exchanges.sum_production(proposal.production_id)
 
         # Send available exchange
@@ -158,7 +173,7 @@ class Broker:
         # Save exchange in ledger
         if quantity_exchange > 0:
             self.ledger_exchanges.add_all(ex)
-        return [deepcopy(e) for e in ex]
+        return [copy(e) for e in ex]
 
 
     def make_offer(self, proposal: Proposal, new_state: NodeState):
@@ -170,22 +185,24 @@ class Broker:
         :return:
         """
         # Build offer
-        prod_asked = Broker.find_production(new_state.productions_used, proposal.production_id)
+        prod_asked = new_state.find_used(proposal.production_id)
         prop_asked = ProposalOffer(production_id=proposal.production_id,
                                    cost=proposal.cost,
                                    quantity=prod_asked.quantity,
                                    path_node=proposal.path_node,
-                                   return_path_node=proposal.path_node[-2::-1]+[self.name])
+                                   return_path_node=proposal.path_node[-2::-1] + (self.name,))
 
         # Receive offer result
         exchanges = self.ask(to=proposal.path_node[0], mes=prop_asked)
-        prod = []
-        for ex in exchanges:
-            ex.path_node = proposal.path_node
-            prod.append(Production(id=ex.production_id, cost=prop_asked.cost, quantity=ex.quantity, type='exchange', exchange=ex))
+        prod = [Production(id=ex.production_id, cost=prop_asked.cost, quantity=ex.quantity, type='exchange',
+                           exchange=ex, path_node=proposal.path_node)
+                for ex in exchanges]
 
-        self.state = optimize_adequacy(consumptions=self.consumptions,
-                                       productions=prod + self.state.productions_used + self.state.productions_free)
+        # No exchange given, state is unchanged
+        if prod:
+            self.state = optimize_adequacy(consumptions=self.consumptions,
+                                           productions=chain(prod, self.state.productions_used,
+                                                             self.state.productions_free))
 
         # Forward proposal with remaining quantity
         exchanges_quantity = sum([ex.quantity for ex in exchanges])
@@ -201,7 +218,7 @@ class Broker:
         """
 
         # Cancel useless exchange
-        useless_exchanges = Broker.filter_exchanges(self.state.productions_free)
+        useless_exchanges = Broker.filter_exchange_productions(self.state.productions_free)
         self.send_cancel_exchange(useless_exchanges)
 
         # Resend proposal
@@ -220,7 +237,7 @@ class Broker:
 
         # Forward if path node has next
         if len(cancel.path_node) > 1:
-            cancel = deepcopy(cancel)
+            cancel = copy(cancel)
             cancel.path_node = cancel.path_node[1:]
             self.tell(to=cancel.path_node[0], mes=cancel)
             return
@@ -228,7 +245,7 @@ class Broker:
         # Send proposal with exchange canceled
         quantity = sum([ex.quantity for ex in cancel.exchanges])
         prod_id = cancel.exchanges[0].production_id
-        cost = [p.cost for p in self.raw_productions if p.id == prod_id][0]
+        cost = self.raw_productions_by_id[prod_id].cost
         prod_free = Production(cost=cost, quantity=quantity, id=prod_id)
         self.send_proposal([prod_free])
 
@@ -247,25 +264,26 @@ class Broker:
                                id=proposal.production_id))
             self.send_proposal([prod], proposal.path_node)
 
-    def send_cancel_exchange(self, exchanges: List[Exchange]):
+    def send_cancel_exchange(self, productions_exchange: List[Production]):
         """
         Send canceled exchange order regrouped by production.
 
-        :param exchanges: exchanges to cancel
+        :param productions_exchange: productions with exchange to cancel
         :return:
         """
         productions = {}
-        for ex in exchanges:
-            if ex.production_id not in productions.keys():
-                productions[ex.production_id] = [[], []]
-            productions[ex.production_id][0].append(ex)
-            productions[ex.production_id][1] = ex.path_node
+        for prod in productions_exchange:
+            group = productions.get(prod.id)
+            if group is None:
+                productions[prod.id] = ([prod.exchange], prod.path_node)
+            else:
+                group[0].append(prod.exchange)
 
         for prod_id, (ex, path) in productions.items():
             cancel = ConsumerCanceledExchange(exchanges=ex, path_node=path)
             self.tell(to=path[0], mes=cancel)
 
-    def generate_exchanges(self, production_id: int, quantity: int, path_node: List[str]):
+    def generate_exchanges(self, production_id: int, quantity: int, path_node: Tuple[str, ...]):
         """
         Generate list to exchanges to fill available quantity with minimum exchange capacity.
 
@@ -275,17 +293,30 @@ class Broker:
         :return: list of exchanges. sum of capacities equals or less quantity asked
         """
         length = int(quantity / self.min_exchange)
+        remain = quantity - length*self.min_exchange
+        ids = self.generate_ids(max(0, length) + (1 if remain else 0))
+
         exchanges = [Exchange(quantity=self.min_exchange,
-                              id=self.uuid_generate(),
+                              id=id,
                               production_id=production_id,
                               path_node=path_node)
-                     for i in range(0, length)]
-
-        remain = quantity - length*self.min_exchange
+                     for id in ids[:length]]
         if remain:
-            exchanges += [Exchange(quantity=remain, id=self.uuid_generate(), production_id=production_id, path_node=path_node)]
+            exchanges.append(Exchange(quantity=remain, id=ids[-1], production_id=production_id, path_node=path_node))
         return exchanges
 
+    def generate_ids(self, length: int) -> List[uuid.UUID]:
+        """
+        Generate many ids at once. Default uuid4 generator is batched in a single random read.
+
+        :param length: number of ids to generate
+        :return: list of ids
+        """
+        if self.uuid_generate is not uuid.uuid4:
+            return [self.uuid_generate() for _ in range(length)]
+        raw = os.urandom(16 * length)
+        return [uuid.UUID(bytes=raw[i*16:(i+1)*16], version=4) for i in range(length)]
+
     def compute_total(self):
         """
         Compute total production used, and exchange at borders
@@ -303,17 +334,14 @@ class Broker:
             b.capacity = self.ledger_exchanges.sum_border(b.dest)
         return self.consumptions, productions, borders
 
-    def trim_path(self, path: List[str]):
+    def trim_path(self, path: Tuple[str, ...]):
         """
         trim older nodes in path.
 
         :param path: whole path from exchange producer
         :return: trimed path with only next nodes
         """
-        while path[0] != self.name and len(path) > 0:
-            del path[0]
-        del path[0]
-        return path
+        return path[path.index(self.name) + 1:]
 
 
     @staticmethod
@@ -323,20 +351,15 @@ class Broker:
         return productions
 
     @staticmethod
-    def filter_exchanges(prods: List[Production]) -> List[Exchange]:
-        return [prod.exchange for prod in prods if prod.exchange is not None]
+    def filter_exchange_productions(prods: List[Production]) -> List[Production]:
+        return [prod for prod in prods if prod.exchange is not None]
 
     @staticmethod
     def filter_productions(prods: List[Production]) -> List[Production]:
         return [prod for prod in prods if prod.exchange is None]
 
     @staticmethod
-    def find_production(prods: List[Production], id: uuid) -> Production:
-        return list(filter(lambda x: x.id == id, prods))[0]
-
-
-    @staticmethod
-    def find_border(borders: List[Border], path: List[str]) -> Border:
+    def find_border(borders: List[Border], path: Tuple[str, ...]) -> Border:
         return [b for b in borders if b.dest in path][0]
     @staticmethod
     def copy_production(production: Production, quantity: int) -> Production:
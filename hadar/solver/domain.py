@@ -4,21 +4,36 @@ from typing import *
 
 
 class DTO:
+    """
+    Base data object. Fields are declared in __slots__ to keep instances small.
+    Fields starting with underscore are private caches and are ignored by comparison and display.
+    """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(name for klass in reversed(cls.__mro__)
+                            for name in klass.__dict__.get('__slots__', ()) if not name.startswith('_'))
+
+    def fields(self):
+        return {k: getattr(self, k) for k in self._fields}
 
     def __hash__(self):
-        return hash(tuple(sorted(self.__dict__.viewitems())))
+        return hash(tuple(sorted(self.fields().items())))
 
     def __eq__(self, other):
-        return isinstance(other, type(self)) and self.__dict__ == other.__dict__
+        return isinstance(other, type(self)) and self.fields() == other.fields()
 
     def __str__(self):
-        return "{}({})".format(type(self).__name__, ", ".join(["{}={}".format(k, str(self.__dict__[k])) for k in sorted(self.__dict__)]))
+        fields = self.fields()
+        return "{}({})".format(type(self).__name__, ", ".join(["{}={}".format(k, str(fields[k])) for k in sorted(fields)]))
 
     def __repr__(self):
         return self.__str__()
 
 
 class Consumption(DTO):
+    __slots__ = ('cost', 'quantity', 'type')
 
     def __init__(self, quantity: int, cost: int=0, type: str=''):
         self.cost = cost
@@ -27,7 +42,9 @@ class Consumption(DTO):
 
 
 class Exchange(DTO):
-    def __init__(self, quantity=0, id: uuid=0, production_id: uuid=0, path_node: List[str]=[]):
+    __slots__ = ('quantity', 'id', 'production_id', 'path_node')
+
+    def __init__(self, quantity=0, id: uuid=0, production_id: uuid=0, path_node: Tuple[str, ...]=()):
         self.quantity = quantity
         self.id = id
         self.production_id = production_id
@@ -35,22 +52,29 @@ class Exchange(DTO):
 
 
 class ConsumerCanceledExchange(DTO):
-    def __init__(self, exchanges: List[Exchange], path_node: List[str]=[]):
+    __slots__ = ('exchanges', 'path_node')
+
+    def __init__(self, exchanges: List[Exchange], path_node: Tuple[str, ...]=()):
         self.exchanges = exchanges
         self.path_node = path_node
 
 
 class Production(DTO):
+    __slots__ = ('type', 'cost', 'quantity', 'id', 'exchange', 'path_node')
 
-    def __init__(self, quantity: int, cost: int=0, type: str='in', id: uuid=0, exchange: Exchange = None):
+    def __init__(self, quantity: int, cost: int=0, type: str='in', id: uuid=0, exchange: Exchange = None,
+                 path_node: Tuple[str, ...]=()):
         self.type = type
         self.cost = cost
         self.quantity = quantity
         self.id = id
         self.exchange = exchange
+        self.path_node = path_node
 
 
 class Border(DTO):
+    __slots__ = ('dest', 'capacity', 'cost')
+
     def __init__(self, dest: str, capacity: int, cost: int=0):
         self.dest = dest
         self.capacity = capacity
@@ -58,6 +82,8 @@ class Border(DTO):
 
 
 class NodeQuantity(DTO):
+    __slots__ = ('min_exchange', 'consumptions', 'productions', 'borders')
+
     def __init__(self, consumptions: List[Consumption]=[], productions: List[Production]=[], borders: [Border]=[], min_exchange=1):
         self.min_exchange = min_exchange
         self.consumptions = consumptions
@@ -66,12 +92,16 @@ class NodeQuantity(DTO):
 
 
 class Study(DTO):
+    __slots__ = ('nodes',)
+
     def __init__(self, nodes: Mapping[str, NodeQuantity]):
         self.nodes = nodes
 
 
 class Proposal(DTO):
-    def __init__(self, production_id: uuid, cost: int, quantity: int, path_node: List[str]):
+    __slots__ = ('production_id', 'cost', 'quantity', 'path_node')
+
+    def __init__(self, production_id: uuid, cost: int, quantity: int, path_node: Tuple[str, ...]):
         self.production_id = production_id
         self.cost = cost
         self.quantity = quantity
@@ -79,20 +109,48 @@ class Proposal(DTO):
 
 
 class ProposalOffer(Proposal):
-    def __init__(self, production_id: uuid, cost: int, quantity: int, path_node: List[str], return_path_node: List[str]):
+    __slots__ = ('return_path_node',)
+
+    def __init__(self, production_id: uuid, cost: int, quantity: int,
+                 path_node: Tuple[str, ...], return_path_node: Tuple[str, ...]):
         Proposal.__init__(self, production_id, cost, quantity, path_node)
         self.return_path_node = return_path_node
 
 
 class NodeState(DTO):
+    __slots__ = ('productions_used', 'productions_free', 'cost', 'rac', '_used_by_id', '_free_by_id', '_worst_used_cost')
+
     def __init__(self, productions_used: List[Production], productions_free: List[Production], cost: int, rac: int):
         self.productions_used = productions_used
         self.productions_free = productions_free
         self.cost = cost
         self.rac = rac
 
+        # Index productions by id, keep first match like a linear scan
+        self._used_by_id = {}
+        self._worst_used_cost = float('-inf')
+        for p in productions_used:
+            self._used_by_id.setdefault(p.id, p)
+            self._worst_used_cost = max(self._worst_used_cost, p.cost)
+        self._free_by_id = {}
+        for p in productions_free:
+            self._free_by_id.setdefault(p.id, p)
+
+    @property
+    def worst_used_cost(self):
+        """Highest unit cost among productions used, -inf if none."""
+        return self._worst_used_cost
+
+    def find_used(self, id: uuid) -> Production:
+        return self._used_by_id[id]
+
+    def find_free(self, id: uuid) -> Production:
+        return self._free_by_id[id]
+
 
 class Event(DTO):
+    __slots__ = ('type', 'message', 'res')
+
     def __init__(self, type: str, message, res=None):
         self.type = type
         self.message = message
@@ -100,14 +158,20 @@ class Event(DTO):
 
 
 class Snapshot(DTO):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
 
 class Start(DTO):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
 class Next(DTO):
+    __slots__ = ()
+
     def __init__(self):
         pass
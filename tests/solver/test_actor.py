@@ -0,0 +1,66 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pykka import ActorDeadError
+
+from hadar.solver.actor import Dispatcher
+from hadar.solver.domain import *
+
+
+@patch('hadar.solver.actor.ActorRegistry')
+@patch('hadar.solver.actor.Waiter')
+class DispatcherTest(unittest.TestCase):
+
+    def test_trace_disabled(self, waiter, registry):
+        dispatcher = Dispatcher(name='fr', trace=False)
+
+        dispatcher.tell_to(to='be', mes=Start())
+        self.assertIsNone(dispatcher.events, 'No events buffer without trace')
+
+    def test_trace_bounded(self, waiter, registry):
+        dispatcher = Dispatcher(name='fr', trace=True, trace_size=2)
+
+        dispatcher.tell_to(to='be', mes=Start())
+        dispatcher.tell_to(to='be', mes=Snapshot())
+        dispatcher.tell_to(to='be', mes=Next())
+        self.assertEqual([Event(type='tell', message=Snapshot()), Event(type='tell', message=Next())],
+                         list(dispatcher.events), 'Events should keep only last trace_size')
+
+    def test_trace_from_env(self, waiter, registry):
+        for value, expected in [('1', True), ('true', True), ('0', False), ('false', False), ('', False)]:
+            with patch.dict(os.environ, {'HADAR_TRACE': value}):
+                self.assertEqual(expected, Dispatcher(name='fr').trace, 'Wrong trace for %s' % value)
+
+    def test_tell_to_cache_ref(self, waiter, registry):
+        ref = MagicMock()
+        registry.get_by_urn.return_value = ref
+        dispatcher = Dispatcher(name='fr')
+
+        dispatcher.tell_to(to='be', mes=Start())
+        dispatcher.tell_to(to='be', mes=Next())
+        registry.get_by_urn.assert_called_once_with('be')
+        self.assertEqual(2, ref.tell.call_count)
+
+    def test_tell_to_dead_actor(self, waiter, registry):
+        ref = MagicMock()
+        registry.get_by_urn.return_value = ref
+        dispatcher = Dispatcher(name='fr')
+        dispatcher.tell_to(to='be', mes=Start())
+
+        ref.tell.side_effect = ActorDeadError('be is dead')
+        with self.assertRaises(ActorDeadError):
+            dispatcher.tell_to(to='be', mes=Next())
+        self.assertNotIn('be', dispatcher.refs, 'Dead actor reference should be evicted')
+        registry.get_by_urn.assert_called_once_with('be')
+
+    def test_ask_to_dead_actor(self, waiter, registry):
+        ref = MagicMock()
+        ref.ask.side_effect = ActorDeadError('be is dead')
+        registry.get_by_urn.return_value = ref
+        dispatcher = Dispatcher(name='fr')
+
+        with self.assertRaises(ActorDeadError):
+            dispatcher.ask_to(to='be', mes=Next())
+        self.assertNotIn('be', dispatcher.refs, 'Dead actor reference should be evicted')
+        ref.ask.assert_called_once_with(Next())
@@ -125,3 +125,4 @@ class TestAdequacy(unittest.TestCase):
         self.assertFalse(is_same_prod(a, b))
         self.assertFalse(is_same_prod(a, c))
         self.assertFalse(is_same_prod(e, f))
+
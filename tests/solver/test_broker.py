@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock, call, patch
 
 from hadar.solver.domain import *
 from hadar.solver.broker import *
@@ -16,16 +16,37 @@ class BrokerTest(unittest.TestCase):
                         borders=[Border(dest='be', capacity=0, cost=5), Border(dest='de', capacity=0, cost=5)])
 
         # Expected
-        proposal = Proposal(production_id=42, cost=15, quantity=30, path_node=['fr', 'be'])
+        proposal = Proposal(production_id=42, cost=15, quantity=30, path_node=('fr', 'be'))
 
         # Test
-        broker.send_proposal(productions=[Production(id=42, cost=10, quantity=30)], path_node=['be'])
-        tell.assert_called_with(to='de', mes=proposal)
+        broker.send_proposal(productions=[Production(id=42, cost=10, quantity=30)], path_node=('be',))
+        tell.assert_called_once_with(to='de', mes=proposal)
+
+    def test_receive_proposal_not_improving(self):
+        # Input
+        broker = Broker(name='fr', tell=None, ask=None,
+                        uuid_generate=lambda: 42,
+                        consumptions=[Consumption(cost=10 ** 6, quantity=10)],
+                        productions=[Production(cost=10, quantity=20)])
+        broker.send_proposal = MagicMock()
+        broker.make_offer = MagicMock()
+
+        prop = Proposal(production_id=1, cost=10, quantity=10, path_node=('be',))
+
+        # Expected
+        expected = Production(cost=10, quantity=10, type='import', id=1)
+
+        # Test
+        with patch('hadar.solver.broker.optimize_adequacy') as optimize:
+            broker.receive_proposal(prop)
+        broker.send_proposal.assert_called_with(productions=[expected], path_node=('be',))
+        broker.make_offer.assert_not_called()
+        optimize.assert_not_called()
 
     def test_receive_proposal_offer_give_all(self):
         # Input
         ledger = LedgerExchange()
-        ledger.add(Exchange(quantity=50, id=1234, production_id=42, path_node=['be']))
+        ledger.add(Exchange(quantity=50, id=1234, production_id=42, path_node=('be',)))
 
         broker = Broker(name='fr',
                         uuid_generate=lambda: 42,
@@ -35,10 +56,10 @@ class BrokerTest(unittest.TestCase):
                         productions=[Production(cost=10, quantity=100)],
                         borders=[Border(dest='be', capacity=100)])
 
-        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=['fr'], return_path_node=['be'])
+        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=('fr',), return_path_node=('be',))
 
         # Expected
-        ex_expected = Exchange(id=42, production_id=42, quantity=50, path_node=['be'])
+        ex_expected = Exchange(id=42, production_id=42, quantity=50, path_node=('be',))
 
         # Test
         ex = broker.receive_proposal_offer(proposal=prop)
@@ -48,8 +69,8 @@ class BrokerTest(unittest.TestCase):
     def test_receive_proposal_offer_capped_by_border(self):
         # Input
         ledger = LedgerExchange()
-        ledger.add(Exchange(quantity=80, id=1234, production_id=42, path_node=['be']))
-        ledger.add(Exchange(quantity=20, id=4321, production_id=24, path_node=['be']))
+        ledger.add(Exchange(quantity=80, id=1234, production_id=42, path_node=('be',)))
+        ledger.add(Exchange(quantity=20, id=4321, production_id=24, path_node=('be',)))
 
         broker = Broker(name='fr',
                         uuid_generate=lambda: 42,
@@ -59,10 +80,10 @@ class BrokerTest(unittest.TestCase):
                         productions=[Production(cost=10, quantity=100)],
                         borders=[Border(dest='be', capacity=120)])
 
-        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=['fr'], return_path_node=['be'])
+        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=('fr',), return_path_node=('be',))
 
         # Expected
-        ex_expected = Exchange(id=42, production_id=42, quantity=20, path_node=['be'])
+        ex_expected = Exchange(id=42, production_id=42, quantity=20, path_node=('be',))
 
         # Test
         ex = broker.receive_proposal_offer(proposal=prop)
@@ -72,7 +93,7 @@ class BrokerTest(unittest.TestCase):
     def test_receive_proposal_offer_capped_by_production(self):
         # Input
         ledger = LedgerExchange()
-        ledger.add(Exchange(quantity=80, id=1234, production_id=42, path_node=['be']))
+        ledger.add(Exchange(quantity=80, id=1234, production_id=42, path_node=('be',)))
 
         broker = Broker(name='fr',
                         uuid_generate=lambda: 42,
@@ -82,10 +103,10 @@ class BrokerTest(unittest.TestCase):
                         productions=[Production(cost=10, quantity=100)],
                         borders=[Border(dest='be', capacity=200)])
 
-        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=['fr'], return_path_node=['be'])
+        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=('fr',), return_path_node=('be',))
 
         # Expected
-        ex_expected = Exchange(id=42, production_id=42, quantity=20, path_node=['be'])
+        ex_expected = Exchange(id=42, production_id=42, quantity=20, path_node=('be',))
 
         # Test
         ex = broker.receive_proposal_offer(proposal=prop)
@@ -96,7 +117,7 @@ class BrokerTest(unittest.TestCase):
         # Input
         ledger = LedgerExchange()
 
-        ex_expected = Exchange(id=1, production_id=42, quantity=50, path_node=['fr', 'it'])
+        ex_expected = Exchange(id=1, production_id=42, quantity=50, path_node=('fr', 'it'))
         ask = MagicMock(return_value=[ex_expected])
         broker = Broker(name='fr',
                         uuid_generate=lambda: 1,
@@ -104,40 +125,44 @@ class BrokerTest(unittest.TestCase):
                         ledger_exchange=ledger,
                         borders=[Border(dest='it', capacity=50)])
 
-        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=['fr', 'be'],
-                             return_path_node=['fr', 'it'])
+        prop = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=('fr', 'be'),
+                             return_path_node=('fr', 'it'))
 
         # Expected
-        prop_forward = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=['be'],
-                                     return_path_node=['fr', 'it'])
+        prop_forward = ProposalOffer(production_id=42, cost=10, quantity=50, path_node=('be',),
+                                     return_path_node=('fr', 'it'))
         # Test
         ex = broker.receive_proposal_offer(proposal=prop)
         self.assertEqual([ex_expected], ex, 'Wrong exchange come back')
         ask.assert_called_with(to='be', mes=prop_forward)
 
-        self.assertEqual({'it': {42: {1: Exchange(id=1, production_id=42, quantity=50, path_node=['it'])}}},
+        self.assertEqual({'it': {42: {1: Exchange(id=1, production_id=42, quantity=50, path_node=('it',))}}},
                          ledger.ledger, 'Wrong ledger state')
 
     def test_make_offer_ask_all_get_all(self):
         # Input
-        ask = MagicMock(return_value=[Exchange(quantity=50)])
+        ex = Exchange(quantity=50, path_node=('fr',))
+        ask = MagicMock(return_value=[ex])
         broker = Broker(name='fr', ask=ask, tell=None,
                         consumptions=[Consumption(cost=10 ** 6, quantity=50)])
         broker.send_cancel_exchange = MagicMock()
 
-        prop = Proposal(production_id=1234, cost=10, quantity=50, path_node=['be'])
+        prop = Proposal(production_id=1234, cost=10, quantity=50, path_node=('be',))
         state = NodeState(productions_used=[Production(cost=10, quantity=50, id=1234)],
                           productions_free=[], cost=0, rac=0)
 
         # Output
         prop_asked = ProposalOffer(production_id=prop.production_id, cost=prop.cost, quantity=prop.quantity,
-                                   path_node=prop.path_node, return_path_node=['fr'])
+                                   path_node=prop.path_node, return_path_node=('fr',))
 
         # Test
         broker.make_offer(proposal=prop, new_state=state)
 
         ask.assert_called_with(to='be', mes=prop_asked)
         broker.send_cancel_exchange.assert_called_with([])
+        self.assertEqual([Production(cost=10, quantity=50, type='exchange', exchange=ex, path_node=('be',))],
+                         broker.state.productions_used)
+        self.assertEqual(('fr',), ex.path_node, 'Exchange should not be updated')
 
     def test_make_offer_ask_partial_get_all(self):
         # Input
@@ -148,13 +173,13 @@ class BrokerTest(unittest.TestCase):
         broker.send_remain_proposal = MagicMock()
         broker.send_cancel_exchange = MagicMock()
 
-        prop = Proposal(production_id=1234, cost=10, quantity=100, path_node=['be'])
+        prop = Proposal(production_id=1234, cost=10, quantity=100, path_node=('be',))
         state = NodeState(productions_used=[Production(cost=10, quantity=50, id=1234)],
                           productions_free=[], cost=0, rac=0)
 
         # Output
         prop_asked = ProposalOffer(production_id=prop.production_id, cost=prop.cost, quantity=50,
-                                   path_node=prop.path_node, return_path_node=['fr'])
+                                   path_node=prop.path_node, return_path_node=('fr',))
 
         # Test
         broker.make_offer(proposal=prop, new_state=state)
@@ -163,16 +188,34 @@ class BrokerTest(unittest.TestCase):
         broker.send_remain_proposal.assert_called_with(proposal=prop, asked_quantity=50, given_quantity=50)
         broker.send_cancel_exchange.assert_called_with([])
 
+    def test_make_offer_get_nothing(self):
+        # Input
+        ask = MagicMock(return_value=[])
+        broker = Broker(name='fr', ask=ask, tell=None,
+                        consumptions=[Consumption(cost=10 ** 6, quantity=50)])
+        broker.send_cancel_exchange = MagicMock()
+        state = broker.state
+
+        prop = Proposal(production_id=1234, cost=10, quantity=50, path_node=('be',))
+        new_state = NodeState(productions_used=[Production(cost=10, quantity=50, id=1234)],
+                              productions_free=[], cost=0, rac=0)
+
+        # Test
+        with patch('hadar.solver.broker.optimize_adequacy') as optimize:
+            broker.make_offer(proposal=prop, new_state=new_state)
+        optimize.assert_not_called()
+        self.assertIs(state, broker.state)
+
     def test_receive_cancel_exchange_forward(self):
         # Input
         tell = MagicMock()
         broker = Broker(name='fr', tell=tell, ask=None)
 
-        exchange = Exchange(quantity=10, id=0, production_id=42, path_node=['fr', 'it'])
-        cancel = ConsumerCanceledExchange(exchanges=[exchange], path_node=['fr', 'it'])
+        exchange = Exchange(quantity=10, id=0, production_id=42, path_node=('fr', 'it'))
+        cancel = ConsumerCanceledExchange(exchanges=[exchange], path_node=('fr', 'it'))
 
         # Expected
-        expected = ConsumerCanceledExchange(exchanges=[exchange], path_node=['it'])
+        expected = ConsumerCanceledExchange(exchanges=[exchange], path_node=('it',))
 
         # Test
         broker.receive_cancel_exchange(cancel)
@@ -181,9 +224,9 @@ class BrokerTest(unittest.TestCase):
     def test_receive_cancel_exchange_cancel(self):
         # Input
         ledger = LedgerExchange()
-        ledger.add(Exchange(quantity=10, id=1, production_id=42, path_node=['be']))
-        ledger.add(Exchange(quantity=10, id=2, production_id=42, path_node=['be']))
-        ledger.add(Exchange(quantity=10, id=3, production_id=42, path_node=['be']))
+        ledger.add(Exchange(quantity=10, id=1, production_id=42, path_node=('be',)))
+        ledger.add(Exchange(quantity=10, id=2, production_id=42, path_node=('be',)))
+        ledger.add(Exchange(quantity=10, id=3, production_id=42, path_node=('be',)))
 
         tell = MagicMock()
         broker = Broker(name='fr',
@@ -193,12 +236,12 @@ class BrokerTest(unittest.TestCase):
                         productions=[Production(cost=10, quantity=40)],
                         borders=[Border(dest='be', capacity=100, cost=2)])
 
-        ex1 = Exchange(quantity=10, id=1, production_id=42, path_node=['be'])
-        ex2 = Exchange(quantity=10, id=2, production_id=42, path_node=['be'])
-        cancel = ConsumerCanceledExchange(exchanges=[ex1, ex2], path_node=['fr'])
+        ex1 = Exchange(quantity=10, id=1, production_id=42, path_node=('be',))
+        ex2 = Exchange(quantity=10, id=2, production_id=42, path_node=('be',))
+        cancel = ConsumerCanceledExchange(exchanges=[ex1, ex2], path_node=('fr',))
 
         # Expected
-        proposal = Proposal(production_id=42, cost=10 + 2, quantity=20, path_node=['fr'])
+        proposal = Proposal(production_id=42, cost=10 + 2, quantity=20, path_node=('fr',))
 
         # Test
         broker.receive_cancel_exchange(cancel)
@@ -210,14 +253,14 @@ class BrokerTest(unittest.TestCase):
         broker = Broker(name='fr', tell=None, ask=None)
         broker.send_proposal = MagicMock()
 
-        prop = Proposal(production_id=1, cost=10, quantity=200, path_node=['be'])
+        prop = Proposal(production_id=1, cost=10, quantity=200, path_node=('be',))
 
         # Expected
         expected = Production(id=1, cost=10, quantity=100)
 
         # Test
         broker.send_remain_proposal(proposal=prop, asked_quantity=100, given_quantity=100)
-        broker.send_proposal.assert_called_with([expected], ['be'])
+        broker.send_proposal.assert_called_with([expected], ('be',))
 
     def test_send_cancel_exchange(self):
         # Input
@@ -226,17 +269,23 @@ class BrokerTest(unittest.TestCase):
         broker = Broker(name='fr', tell=tell, ask=None)
 
         exchanges = [
-            Exchange(quantity=10, id=0, production_id=24, path_node=['be']),
-            Exchange(quantity=10, id=1, production_id=24, path_node=['be']),
-            Exchange(quantity=10, id=2, production_id=42, path_node=['de']),
-            Exchange(quantity=10, id=3, production_id=24, path_node=['be']),
+            Exchange(quantity=10, id=0, production_id=24, path_node=('fr',)),
+            Exchange(quantity=10, id=1, production_id=24, path_node=('fr',)),
+            Exchange(quantity=10, id=2, production_id=42, path_node=('fr',)),
+            Exchange(quantity=10, id=3, production_id=24, path_node=('fr',)),
+        ]
+        productions = [
+            Production(quantity=10, id=24, type='exchange', exchange=exchanges[0], path_node=('be',)),
+            Production(quantity=10, id=24, type='exchange', exchange=exchanges[1], path_node=('be',)),
+            Production(quantity=10, id=42, type='exchange', exchange=exchanges[2], path_node=('de',)),
+            Production(quantity=10, id=24, type='exchange', exchange=exchanges[3], path_node=('be',)),
         ]
 
         # Expected
-        cancel24 = ConsumerCanceledExchange(exchanges=[exchanges[0], exchanges[1], exchanges[3]], path_node=['be'])
-        cancel42 = ConsumerCanceledExchange(exchanges=[exchanges[2]], path_node=['de'])
+        cancel24 = ConsumerCanceledExchange(exchanges=[exchanges[0], exchanges[1], exchanges[3]], path_node=('be',))
+        cancel42 = ConsumerCanceledExchange(exchanges=[exchanges[2]], path_node=('de',))
 
-        broker.send_cancel_exchange(exchanges)
+        broker.send_cancel_exchange(productions)
 
         tell.assert_has_calls([call(to='be', mes=cancel24), call(to='de', mes=cancel42)])
 
@@ -249,42 +298,57 @@ class BrokerTest(unittest.TestCase):
 
         # Expected
         expected = [
-            Exchange(id=42, production_id=45, quantity=10, path_node=['fr']),
-            Exchange(id=42, production_id=45, quantity=10, path_node=['fr'])
+            Exchange(id=42, production_id=45, quantity=10, path_node=('fr',)),
+            Exchange(id=42, production_id=45, quantity=10, path_node=('fr',))
         ]
 
         # Test complete
-        res = broker.generate_exchanges(production_id=45, quantity=20, path_node=['fr'])
+        res = broker.generate_exchanges(production_id=45, quantity=20, path_node=('fr',))
         self.assertEqual(expected, res, 'Wrong exchange generation')
 
         # Expected
         expected = [
-            Exchange(id=42, production_id=45, quantity=10, path_node=['fr']),
-            Exchange(id=42, production_id=45, quantity=10, path_node=['fr']),
-            Exchange(id=42, production_id=45, quantity=5, path_node=['fr'])
+            Exchange(id=42, production_id=45, quantity=10, path_node=('fr',)),
+            Exchange(id=42, production_id=45, quantity=10, path_node=('fr',)),
+            Exchange(id=42, production_id=45, quantity=5, path_node=('fr',))
         ]
 
         # Test partial
-        res = broker.generate_exchanges(production_id=45, quantity=25, path_node=['fr'])
+        res = broker.generate_exchanges(production_id=45, quantity=25, path_node=('fr',))
         self.assertEqual(expected, res, 'Wrong exchange generation')
 
         # Test empty
-        res = broker.generate_exchanges(production_id=45, quantity=0, path_node=['fr'])
+        res = broker.generate_exchanges(production_id=45, quantity=0, path_node=('fr',))
         self.assertEqual([], res, 'Wrong empty exchange generation')
 
+    def test_generate_ids(self):
+        broker = Broker(name='fr', tell=None, ask=None)
+
+        ids = broker.generate_ids(3)
+        self.assertEqual(3, len(set(ids)), 'Ids are not unique')
+        self.assertTrue(all(id.version == 4 for id in ids), 'Ids are not uuid4')
+        self.assertEqual([], broker.generate_ids(0))
+
     def test_find_production(self):
         productions = [
             Production(type='nuclear', cost=10, quantity=200, id=98),
             Production(type='solar', cost=5, quantity=50, id=23),
-            Production(type='oil', cost=20, quantity=200, id=45)
+            Production(type='oil', cost=20, quantity=200, id=45),
+            Production(type='import', cost=30, quantity=10, id=23)
         ]
+        state = NodeState(productions_used=productions[:2], productions_free=productions[2:], cost=0, rac=0)
 
-        self.assertEqual(productions[1], Broker.find_production(prods=productions, id=23),
-                         "Can't find productions by id")
+        self.assertIs(productions[1], state.find_used(23), "Can't find used productions by id")
+        self.assertIs(productions[3], state.find_free(23), "Can't find free productions by id")
+        self.assertRaises(KeyError, state.find_free, 98)
+
+        # Keep first production when id is shared
+        state = NodeState(productions_used=productions[1:], productions_free=[], cost=0, rac=0)
+        self.assertIs(productions[1], state.find_used(23), 'First production should be found')
 
     def test_compute_total(self):
         ledger = LedgerExchange()
-        ledger.add(Exchange(quantity=10, id=1, production_id=42, path_node=['be']))
+        ledger.add(Exchange(quantity=10, id=1, production_id=42, path_node=('be',)))
         broker = Broker(name='fr',
                         ask=None, tell=None,
                         uuid_generate=lambda: 42,
@@ -298,15 +362,20 @@ class BrokerTest(unittest.TestCase):
         self.assertEqual([Production(quantity=20, cost=10, id=42)], productions, 'Wrong compute productions')
         self.assertEqual([Border(dest='be', capacity=10, cost=10)], border)
 
+    def test_compute_total_default(self):
+        broker = Broker(name='fr', ask=None, tell=None)
+
+        self.assertEqual(([], [], []), broker.compute_total(), 'Defaults should be empty lists')
+
 
 class TestLedgerExchange(unittest.TestCase):
 
     def test(self):
         ex = [
-            Exchange(id=1234, production_id=1, quantity=10, path_node=['fr']),
-            Exchange(id=9876, production_id=1, quantity=10, path_node=['fr']),
-            Exchange(id=5432, production_id=1, quantity=10, path_node=['be']),
-            Exchange(id=4566, production_id=2, quantity=10, path_node=['fr'])
+            Exchange(id=1234, production_id=1, quantity=10, path_node=('fr',)),
+            Exchange(id=9876, production_id=1, quantity=10, path_node=('fr',)),
+            Exchange(id=5432, production_id=1, quantity=10, path_node=('be',)),
+            Exchange(id=4566, production_id=2, quantity=10, path_node=('fr',))
         ]
         ledger = LedgerExchange()
         ledger.add_all(ex)
@@ -317,3 +386,6 @@ class TestLedgerExchange(unittest.TestCase):
         ledger.delete(ex[1])
         self.assertEqual(20, ledger.sum_production(production_id=1), "Wrong ledger behaviour")
         self.assertEqual(20, ledger.sum_border(name='fr'), 'Wrong ledger behaviour')
+
+        ledger.delete(Exchange(id=1111, production_id=1, quantity=10, path_node=('fr',)))
+        self.assertEqual(20, ledger.sum_production(production_id=1), "Wrong ledger behaviour")
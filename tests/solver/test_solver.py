@@ -200,3 +200,58 @@ class TestSolver(unittest.TestCase):
         res = solve(Study(nodes=nodes))
 
         assert_study(self, Study(nodes_expected), res)
+
+    def test_isolated_node_with_exchange(self):
+        """
+        Capacity
+        |          A           | --------> |          B           |
+        | load: 10             |  20       | load: 10             |
+        | nuclear: 30 @ 10     |           | nuclear: 10 @ 20     |
+
+        |          C           |
+        | load: 10             |
+        | solar: 20 @ 5        |
+
+        Adequacy
+        |          A           | --------> |          B           |
+        | load: 10             |  10       | load: 10             |
+        | nuclear: 20          |           | nuclear: 0           |
+
+        |          C           |
+        | load: 10             |
+        | solar: 10            |
+        :return:
+        """
+        nodes = {}
+        nodes['c'] = NodeQuantity(min_exchange=1,
+                                  consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                  productions=[Production(cost=5, quantity=20, type='solar')])
+
+        nodes['a'] = NodeQuantity(min_exchange=1,
+                                  consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                  productions=[Production(cost=10, quantity=30, type='nuclear')],
+                                  borders=[Border(dest='b', capacity=20, cost=2)])
+
+        nodes['b'] = NodeQuantity(min_exchange=1,
+                                  consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                  productions=[Production(cost=20, quantity=10, type='nuclear')])
+
+        nodes_expected = {}
+        nodes_expected['a'] = NodeQuantity(min_exchange=1,
+                                           consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                           productions=[Production(cost=10, quantity=20, type='nuclear')],
+                                           borders=[Border(dest='b', capacity=10, cost=2)])
+
+        nodes_expected['b'] = NodeQuantity(min_exchange=1,
+                                           consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                           productions=[Production(cost=20, quantity=0, type='nuclear')])
+
+        nodes_expected['c'] = NodeQuantity(min_exchange=1,
+                                           consumptions=[Consumption(cost=10 ** 6, quantity=10, type='load')],
+                                           productions=[Production(cost=5, quantity=10, type='solar')])
+
+        res = solve(Study(nodes=nodes))
+
+        self.assertEqual(set(nodes_expected.keys()), set(res.nodes.keys()), 'Wrong nodes in result')
+        self.assertEqual([], res.nodes['c'].borders, 'Isolated node should not have border')
+        assert_study(self, Study(nodes_expected), res)
@@ -43,7 +43,7 @@ def plot(d):
     print("Node ", d.name, 'rac=', d.broker.state.rac, 'cost=', d.broker.state.cost)
     print('\nEvents')
     print('\ttype\tmes')
-    for event in d.events:
+    for event in d.events or []:
         print('\t{type: <8}{mes}'.format(type=event.type, mes=event.message))
 
     print("\nProduction used")
@@ -54,7 +54,7 @@ def plot(d):
         if p.exchange is None:
             print('None')
         else:
-            print('{id: <36}{path}'.format(id=p.exchange.id.hex, path=p.exchange.path_node))
+            print('{id: <36}{path}'.format(id=p.exchange.id.hex, path=p.path_node))
 
     print("\nProduction free")
     print('\ttype    id\t\t\t\t\t\t\t\t\tcost\tquantity')